@@ -1,20 +1,496 @@
-from flask import Flask, render_template, request, jsonify
+# Patch the stdlib before anything else imports sockets so blocking
+# upstream calls yield to other greenlets under gevent workers
+from gevent import monkey
+monkey.patch_all()
+
+from flask import Flask, Response, render_template, request
 from flask_cors import CORS
+from flask_compress import Compress
 import requests
+import redis
+import orjson
+import msgspec
+import pybase64
+import brotli
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
 import os
+import gzip
+import socket
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Union
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Debug output is off by default; set LOG_LEVEL=DEBUG to trace upstream calls
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING').upper())
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app)
 application = app
 
+# Compress JSON (including base64 TTS bodies) and the page itself; the
+# raw audio stream is left alone since WAV gains little from it
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/html']
+app.config['COMPRESS_MIN_SIZE'] = 512
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_BR_LEVEL'] = 4
+Compress(app)
+
+# Keep Flask's own JSON provider cheap for anything that still goes through it
+app.json.sort_keys = False
+app.json.compact = True
+
 # Security: Use environment variables
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', os.urandom(24).hex())
+
+# Reject oversized bodies in Werkzeug before they reach a handler
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024
 GHANANLP_API_KEY = os.getenv('GHANANLP_API_KEY', '')
 
+TRANSLATE_API_URL = "https://translation-api.ghananlp.org/v1/translate"
+TTS_API_URL = "https://translation-api.ghananlp.org/tts/v1/synthesize"
+
+# Per-request timeout for translate calls (applies to connect and read each)
+TRANSLATE_TIMEOUT = 15
+
+# Extra attempts the session makes on connect errors and retryable statuses
+GNLP_RETRIES = 2
+
+# GhanaNLP language code mapping
+LANG_MAP = {
+    'en': 'en',
+    'tw': 'tw',  # Asante Twi
+    'twi_akuapem': 'ak',  # Akuapem Twi
+    'ewe': 'ee',
+    'ga': 'gaa',
+    'dagbani': 'dag',
+    'fante': 'fat',
+    'kikuyu': 'ki'  # Added Kikuyu support
+}
+
+# Speaker mapping based on GhanaNLP API response
+SPEAKER_MAP = {
+    'tw': ['twi_speaker_4', 'twi_speaker_5', 'twi_speaker_6', 'twi_speaker_7', 'twi_speaker_8', 'twi_speaker_9'],
+    'ewe': ['ewe_speaker_3', 'ewe_speaker_4'],
+    'kikuyu': ['kikuyu_speaker_1', 'kikuyu_speaker_5']
+}
+
+# Language codes for TTS
+TTS_LANG_MAP = {
+    'tw': 'tw',
+    'ewe': 'ee',
+    'kikuyu': 'ki'
+}
+
+LANGUAGES = [
+    {'code': 'en', 'name': 'English', 'flag': '🇬🇧', 'native': 'English', 'tts': True},
+    {'code': 'tw', 'name': 'Twi (Asante)', 'flag': '🇬🇭', 'native': 'Twi', 'tts': True},
+    {'code': 'ewe', 'name': 'Ewe', 'flag': '🇬🇭', 'native': 'Eʋegbe', 'tts': True},
+    {'code': 'kikuyu', 'name': 'Kikuyu', 'flag': '🇰🇪', 'native': 'Gĩkũyũ', 'tts': True},
+    {'code': 'twi_akuapem', 'name': 'Twi (Akuapem)', 'flag': '🇬🇭', 'native': 'Akuapem', 'tts': False},
+    {'code': 'ga', 'name': 'Ga', 'flag': '🇬🇭', 'native': 'Gã', 'tts': False},
+    {'code': 'dagbani', 'name': 'Dagbani', 'flag': '🇬🇭', 'native': 'Dagbanli', 'tts': False},
+    {'code': 'fante', 'name': 'Fante', 'flag': '🇬🇭', 'native': 'Mfantse', 'tts': False}
+]
+
+# The language list never changes, so serialize, pre-compress and tag it
+# once at startup. The route negotiates the encoding itself so the ETag on
+# a 304 always matches the one the 200 would have carried.
+_LANGUAGES_JSON = orjson.dumps({'languages': LANGUAGES})
+_LANGUAGES_ETAG = hashlib.md5(_LANGUAGES_JSON).hexdigest()
+_LANGUAGES_BODIES = {
+    None: _LANGUAGES_JSON,
+    'br': brotli.compress(_LANGUAGES_JSON),
+    'gzip': gzip.compress(_LANGUAGES_JSON)
+}
+
+_BASE_HEADERS = {
+    'Content-Type': 'application/json',
+    'Ocp-Apim-Subscription-Key': GHANANLP_API_KEY
+}
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that turns on TCP keepalive for pooled connections, so idle
+    sockets aren't silently dropped by proxies and load balancers"""
+
+    socket_options = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    ]
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60))
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+class _NoReadTimeoutRetry(Retry):
+    """Retry that gives up immediately on read timeouts, so a slow call
+    surfaces as a Timeout after one request timeout rather than several.
+    Other read errors, such as a pooled connection the server already
+    closed, are still retried."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if isinstance(error, ReadTimeoutError):
+            raise error.with_traceback(_stacktrace)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+# Shared HTTP session: keeps connections to GhanaNLP alive between requests
+# instead of paying a fresh TCP + TLS handshake on every call. The pool is
+# sized for many concurrent greenlets per worker; connections beyond
+# pool_maxsize are discarded after use, so the next request opens a new one
+_session = requests.Session()
+_session.mount('https://', _KeepAliveAdapter(
+    pool_connections=50,
+    pool_maxsize=200,
+    pool_block=False,
+    # Translate and TTS calls are effectively idempotent, so POST is retried
+    # too; jitter keeps workers from retrying in lockstep after a blip.
+    # Read timeouts are not retried (see _NoReadTimeoutRetry), but dropped
+    # keep-alive connections are. Retry-After is ignored because quota 429s
+    # can ask for minutes, which the request timeout does not bound; a short
+    # rate-limit blip is still retried.
+    max_retries=_NoReadTimeoutRetry(
+        total=GNLP_RETRIES,
+        backoff_factor=0.3,
+        backoff_jitter=0.1,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=['POST', 'GET'],
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+))
+_session.headers.update(_BASE_HEADERS)
+
+# Result cache: a small in-process LRU in front of an optional Redis.
+# Redis is only used when REDIS_URL is set; any Redis failure falls back
+# to calling the API directly.
+REDIS_URL = os.getenv('REDIS_URL', '')
+TRANSLATION_CACHE_TTL = 60 * 60 * 24 * 14  # 14 days
+TTS_CACHE_TTL = 60 * 60 * 24 * 14
+
+# Short socket timeouts so an unreachable Redis costs milliseconds, not the
+# OS TCP timeout, before falling back to the API
+REDIS_SOCKET_TIMEOUT = 0.2
+
+_redis = redis.Redis(connection_pool=redis.ConnectionPool.from_url(
+    REDIS_URL,
+    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT
+)) if REDIS_URL else None
+
+
+class _LRUCache:
+    """Thread-safe, size-bounded in-process cache"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_translation_cache = _LRUCache(maxsize=2048)
+_tts_cache = _LRUCache(maxsize=256)
+
+
+def _cache_get(local, key):
+    """Look up raw bytes in the local LRU, then Redis"""
+    value = local.get(key)
+    if value is not None or _redis is None:
+        return value
+    try:
+        value = _redis.get(key)
+    except redis.RedisError as e:
+        logger.warning("Cache read failed: %s", e)
+        return None
+    if value is not None:
+        local.set(key, value)
+    return value
+
+
+def _cache_set(local, key, value, ttl):
+    """Store raw bytes in the local LRU and Redis"""
+    local.set(key, value)
+    if _redis is None:
+        return
+    try:
+        _redis.set(key, value, ex=ttl)
+    except redis.RedisError as e:
+        logger.warning("Cache write failed: %s", e)
+
+
+def _json_response(obj, status=200):
+    """Serialize obj with orjson; much faster than jsonify on large payloads"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+
+def _text_hash(text):
+    return hashlib.md5(text.strip().encode('utf-8')).hexdigest()
+
+
+class _CircuitBreaker:
+    """Fail fast locally while an upstream endpoint keeps erroring"""
+
+    def __init__(self, threshold=3, window=30, cooldown=20):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._fails = 0
+        self._first_fail = 0.0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        return time.monotonic() < self._open_until
+
+    def record_success(self):
+        with self._lock:
+            self._fails = 0
+
+    def record_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._first_fail > self.window:
+                self._fails = 0
+                self._first_fail = now
+            self._fails += 1
+            if self._fails >= self.threshold:
+                self._open_until = now + self.cooldown
+                self._fails = 0
+
+
+_breakers = {
+    'translate': _CircuitBreaker(),
+    'tts': _CircuitBreaker()
+}
+
+# Recent upstream 5xx errors per input, so retrying the same failing
+# request doesn't go back to GhanaNLP straight away
+ERROR_CACHE_TTL = 15
+_error_cache = _LRUCache(maxsize=1024)
+
+UPSTREAM_UNAVAILABLE = (
+    'Upstream temporarily unavailable',
+    'GhanaNLP is not responding right now. Please try again in a few seconds.',
+    503
+)
+
+
+def _recent_error(key):
+    """Return (error, details, status_code) if key failed within ERROR_CACHE_TTL"""
+    entry = _error_cache.get(key)
+    if entry is not None and time.monotonic() < entry[0]:
+        return entry[1:]
+    return None
+
+
+def _remember_error(key, error, details, status_code):
+    _error_cache.set(key, (time.monotonic() + ERROR_CACHE_TTL, error, details, status_code))
+
+
+# Upper bound on concurrent upstream calls for a single batch request.
+# Under gevent the executor's threads are greenlets, so this is cheap to
+# raise; keep it well below the session's pool_maxsize.
+BATCH_MAX_WORKERS = 16
+
+# Longest text (per segment) accepted for translation
+MAX_TEXT_LENGTH = 5000
+
+# Most segments accepted in one batch, so a single request can't fan out
+# into thousands of upstream calls
+MAX_BATCH_SIZE = 100
+
+# Translations currently being fetched, keyed like the cache
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# How long a coalesced request waits on the in-flight call it joined. The
+# leader's worst case is every attempt using its full connect and read
+# timeout, plus a second for the retry backoff.
+INFLIGHT_WAIT_TIMEOUT = (GNLP_RETRIES + 1) * 2 * TRANSLATE_TIMEOUT + 1
+
+
+class GhanaNLPError(Exception):
+    """GhanaNLP call failure, carried back to the route as an error response"""
+
+    def __init__(self, error, details, status_code):
+        super().__init__(error)
+        self.error = error
+        self.details = details
+        self.status_code = status_code
+
+
+_ENDPOINTS = {
+    'translate': TRANSLATE_API_URL,
+    'tts': TTS_API_URL
+}
+
+
+def _call_gnlp(endpoint, payload, timeout, **kwargs):
+    """
+    POST payload to a GhanaNLP endpoint ('translate' or 'tts') through the
+    shared session, honouring and updating that endpoint's circuit breaker.
+    Retries with jittered backoff happen inside the session's adapter.
+    """
+    breaker = _breakers[endpoint]
+    if breaker.is_open():
+        raise GhanaNLPError(*UPSTREAM_UNAVAILABLE)
+    
+    started = time.monotonic()
+    try:
+        response = _session.post(_ENDPOINTS[endpoint], json=payload, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException:
+        breaker.record_failure()
+        raise
+    
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    
+    logger.debug("GhanaNLP %s: status %s in %.3fs", endpoint, response.status_code, time.monotonic() - started)
+    return response
+
+
+def _upstream_error_message(response, default):
+    """Best-effort error message from a failed GhanaNLP response"""
+    try:
+        error_data = orjson.loads(response.content)
+        return error_data.get('error', error_data.get('message', default))
+    except:
+        return response.text[:200] if response.text else default
+
+
+def _translate_one(text, source, target):
+    """Translate a single string via GhanaNLP, using the cache when possible"""
+    if not text.strip():
+        return text
+    
+    cache_key = f"gnlp:v1:{source}-{target}:{_text_hash(text)}"
+    cached = _cache_get(_translation_cache, cache_key)
+    if cached is not None:
+        return cached.decode('utf-8')
+    
+    # Single-flight: concurrent requests for the same text share one API call
+    with _inflight_lock:
+        future = _inflight.get(cache_key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[cache_key] = future
+    
+    if not is_leader:
+        try:
+            return future.result(timeout=INFLIGHT_WAIT_TIMEOUT)
+        except FutureTimeoutError:
+            raise GhanaNLPError(
+                'Translation request timed out',
+                'The server took too long to respond. Please try again.',
+                504
+            )
+    
+    try:
+        translated_text = _fetch_translation(text, source, target, cache_key)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(translated_text)
+        return translated_text
+    finally:
+        with _inflight_lock:
+            del _inflight[cache_key]
+
+
+def _fetch_translation(text, source, target, cache_key):
+    """Call the GhanaNLP translate endpoint and cache the result"""
+    recent = _recent_error(cache_key)
+    if recent is not None:
+        raise GhanaNLPError(*recent)
+    
+    # Call GhanaNLP Translation API
+    payload = {
+        'in': text,
+        'lang': f"{source}-{target}"
+    }
+    
+    response = _call_gnlp('translate', payload, timeout=TRANSLATE_TIMEOUT)
+    
+    if response.status_code != 200:
+        error_msg = _upstream_error_message(response, f"API returned status {response.status_code}")
+        details = 'Please check your API key and try again.'
+        if response.status_code >= 500:
+            _remember_error(cache_key, error_msg, details, response.status_code)
+        raise GhanaNLPError(error_msg, details, response.status_code)
+    
+    result = orjson.loads(response.content)
+    
+    # Handle different response formats from GhanaNLP
+    if isinstance(result, dict):
+        translated_text = result.get('out', result.get('translation', result.get('translatedText', '')))
+    elif isinstance(result, str):
+        translated_text = result
+    else:
+        translated_text = str(result)
+    
+    if not translated_text:
+        raise GhanaNLPError(
+            'Empty translation received',
+            'The API returned an empty translation. Please try again.',
+            500
+        )
+    
+    _cache_set(_translation_cache, cache_key, translated_text.encode('utf-8'), TRANSLATION_CACHE_TTL)
+    return translated_text
+
+class TranslateRequest(msgspec.Struct):
+    """Body of /api/translate; text may be a single string or a batch"""
+    text: Union[str, List[str]] = ''
+    source: str = 'en'
+    target: str = 'tw'
+
+
+class TTSRequest(msgspec.Struct):
+    """Body of /api/text-to-speech"""
+    text: str = ''
+    language: str = 'tw'
+    format: str = 'audio'
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return _json_response({
+        'error': 'Request too large',
+        'details': f"Request bodies are limited to {app.config['MAX_CONTENT_LENGTH'] // 1024} KB."
+    }, 413)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -24,305 +500,389 @@ def translate_text():
     """
     Translate text using GhanaNLP API
     Supports: English <-> Twi, Ewe, Ga, Dagbani, Akuapem Twi, Fante, etc.
+    Accepts a single string or a list of strings as 'text'
     """
+    # Read outside the try so an oversized body reaches the 413 handler
+    raw = request.get_data(cache=False)
     try:
-        data = request.json
-        text = data.get('text', '')
-        source_lang = data.get('source', 'en')
-        target_lang = data.get('target', 'tw')
+        req = msgspec.json.decode(raw, type=TranslateRequest)
+        text = req.text
+        source_lang = req.source
+        target_lang = req.target
         
         if not text:
-            return jsonify({'error': 'Missing text'}), 400
+            return _json_response({'error': 'Missing text'}, 400)
         
         # Check if API key is configured
         if not GHANANLP_API_KEY:
-            return jsonify({
+            return _json_response({
                 'error': 'API key not configured',
                 'details': 'Please add your GhanaNLP API key to .env file. Get one at https://translation.ghananlp.org'
-            }), 401
+            }, 401)
         
-        # GhanaNLP language code mapping
-        lang_map = {
-            'en': 'en',
-            'tw': 'tw',  # Asante Twi
-            'twi_akuapem': 'ak',  # Akuapem Twi
-            'ewe': 'ee',
-            'ga': 'gaa',
-            'dagbani': 'dag',
-            'fante': 'fat',
-            'kikuyu': 'ki'  # Added Kikuyu support
-        }
+        source = LANG_MAP.get(source_lang, source_lang)
+        target = LANG_MAP.get(target_lang, target_lang)
         
-        source = lang_map.get(source_lang, source_lang)
-        target = lang_map.get(target_lang, target_lang)
+        segments = text if isinstance(text, list) else [text]
+        if len(segments) > MAX_BATCH_SIZE:
+            return _json_response({
+                'error': 'Too many texts',
+                'details': f'A batch may contain at most {MAX_BATCH_SIZE} texts.'
+            }, 413)
         
-        # Call GhanaNLP Translation API
-        headers = {
-            'Content-Type': 'application/json',
-            'Ocp-Apim-Subscription-Key': GHANANLP_API_KEY
-        }
+        if any(len(t) > MAX_TEXT_LENGTH for t in segments):
+            return _json_response({
+                'error': 'Text too long',
+                'details': f'Each text must be at most {MAX_TEXT_LENGTH} characters.'
+            }, 413)
         
-        payload = {
-            'in': text,
-            'lang': f"{source}-{target}"
-        }
-        
-        print(f"Translating: {source} -> {target}")
+        # Nothing to translate: echo the input back without calling the API
+        if source == target or not any(t.strip() for t in segments):
+            if isinstance(text, list):
+                result = {'translated_texts': text, 'original_texts': text}
+            else:
+                result = {'translated_text': text, 'original_text': text}
+            return _json_response({
+                'success': True,
+                **result,
+                'source_language': source_lang,
+                'target_language': target_lang,
+                'provider': 'identity'
+            })
         
-        response = requests.post(
-            "https://translation-api.ghananlp.org/v1/translate",
-            json=payload,
-            headers=headers,
-            timeout=15
-        )
+        logger.debug("Translating: %s -> %s", source, target)
         
-        if response.status_code == 200:
-            result = response.json()
+        if isinstance(text, list):
+            # Translate each distinct segment once, concurrently, then map
+            # the results back onto the original order
+            unique = list(dict.fromkeys(text))
+            with ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS) as executor:
+                translations = dict(zip(unique, executor.map(
+                    lambda t: _translate_one(t, source, target), unique
+                )))
             
-            # Handle different response formats from GhanaNLP
-            if isinstance(result, dict):
-                translated_text = result.get('out', result.get('translation', result.get('translatedText', '')))
-            elif isinstance(result, str):
-                translated_text = result
-            else:
-                translated_text = str(result)
-            
-            if not translated_text:
-                return jsonify({
-                    'error': 'Empty translation received',
-                    'details': 'The API returned an empty translation. Please try again.'
-                }), 500
-            
-            return jsonify({
+            return _json_response({
                 'success': True,
-                'translated_text': translated_text,
-                'original_text': text,
+                'translated_texts': [translations[t] for t in text],
+                'original_texts': text,
                 'source_language': source_lang,
                 'target_language': target_lang,
                 'provider': 'GhanaNLP'
             })
-        else:
-            error_msg = f"API returned status {response.status_code}"
-            try:
-                error_data = response.json()
-                error_msg = error_data.get('error', error_data.get('message', error_msg))
-            except:
-                error_msg = response.text or error_msg
-            
-            return jsonify({
-                'error': error_msg,
-                'details': 'Please check your API key and try again.'
-            }), response.status_code
+        
+        translated_text = _translate_one(text, source, target)
+        
+        return _json_response({
+            'success': True,
+            'translated_text': translated_text,
+            'original_text': text,
+            'source_language': source_lang,
+            'target_language': target_lang,
+            'provider': 'GhanaNLP'
+        })
             
+    except msgspec.DecodeError as e:
+        return _json_response({'error': 'Invalid request body', 'details': str(e)}, 400)
+    except GhanaNLPError as e:
+        return _json_response({'error': e.error, 'details': e.details}, e.status_code)
     except requests.exceptions.Timeout:
-        return jsonify({
+        return _json_response({
             'error': 'Translation request timed out',
             'details': 'The server took too long to respond. Please try again.'
-        }), 504
+        }, 504)
     except requests.exceptions.ConnectionError:
-        return jsonify({
+        return _json_response({
             'error': 'Connection error',
             'details': 'Unable to connect to GhanaNLP API. Please check your internet connection.'
-        }), 503
+        }, 503)
     except Exception as e:
-        print(f"Error: {str(e)}")
-        return jsonify({
+        logger.exception("Translation error: %s", e)
+        return _json_response({
             'error': str(e),
             'details': 'An unexpected error occurred. Please try again.'
-        }), 500
+        }, 500)
 
 @app.route('/api/languages', methods=['GET'])
 def get_languages():
     """Get available language pairs"""
-    languages = [
-        {'code': 'en', 'name': 'English', 'flag': '🇬🇧', 'native': 'English', 'tts': True},
-        {'code': 'tw', 'name': 'Twi (Asante)', 'flag': '🇬🇭', 'native': 'Twi', 'tts': True},
-        {'code': 'ewe', 'name': 'Ewe', 'flag': '🇬🇭', 'native': 'Eʋegbe', 'tts': True},
-        {'code': 'kikuyu', 'name': 'Kikuyu', 'flag': '🇰🇪', 'native': 'Gĩkũyũ', 'tts': True},
-        {'code': 'twi_akuapem', 'name': 'Twi (Akuapem)', 'flag': '🇬🇭', 'native': 'Akuapem', 'tts': False},
-        {'code': 'ga', 'name': 'Ga', 'flag': '🇬🇭', 'native': 'Gã', 'tts': False},
-        {'code': 'dagbani', 'name': 'Dagbani', 'flag': '🇬🇭', 'native': 'Dagbanli', 'tts': False},
-        {'code': 'fante', 'name': 'Fante', 'flag': '🇬🇭', 'native': 'Mfantse', 'tts': False}
-    ]
-    return jsonify({'languages': languages})
+    encoding = request.accept_encodings.best_match(['br', 'gzip'])
+    etag = _LANGUAGES_ETAG if encoding is None else f'{_LANGUAGES_ETAG}:{encoding}'
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'public, max-age=3600',
+        'Vary': 'Accept-Encoding'
+    }
+    # Weak comparison, as If-None-Match requires; also matches "*"
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return Response(_LANGUAGES_BODIES[encoding], mimetype='application/json', headers=headers)
+
+TTS_CHUNK_SIZE = 8192
+
+# Common phrases synthesized ahead of time so they never wait on the API.
+# Enabled with TTS_WARMUP=1; entries are kept longer than on-demand audio.
+TTS_WARMUP = os.getenv('TTS_WARMUP', '').lower() in ('1', 'true', 'yes')
+TTS_WARMUP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tts_warmup.json')
+TTS_WARMUP_CACHE_TTL = 60 * 60 * 24 * 30  # 30 days
+
+
+def _tts_cache_key(language, speaker_id, text):
+    return f"gnlp:tts:v1:{language}:{speaker_id}:{_text_hash(text)}"
+
+
+def _parse_tts_json(content):
+    """Pull (audio bytes, audio URL) out of a JSON TTS response; raises ValueError if it isn't a JSON object"""
+    result = orjson.loads(content)
+    if not isinstance(result, dict):
+        raise ValueError(f"Expected a JSON object, got {type(result).__name__}")
+    audio_data = result.get('audio', result.get('audio_content', result.get('audio_base64', '')))
+    audio_url = result.get('audio_url', result.get('url', ''))
+    if audio_data:
+        return pybase64.b64decode(audio_data), audio_url
+    return None, audio_url
+
+
+def _get_audio_url(audio_url):
+    """Fetch audio from URL (don't forward our API key to another host)"""
+    return _session.get(
+        audio_url,
+        headers={'Ocp-Apim-Subscription-Key': None},
+        timeout=30
+    )
+
+
+def _is_audio_response(response):
+    content_type = response.headers.get('Content-Type', '').lower()
+    return 'audio' in content_type or 'octet-stream' in content_type
+
+
+def _request_tts(text, language, cache_key, stream=False):
+    """POST text to the TTS endpoint with the language's default speaker"""
+    recent = _recent_error(cache_key)
+    if recent is not None:
+        raise GhanaNLPError(*recent)
+    
+    lang_code = TTS_LANG_MAP.get(language, language)
+    # Use the first speaker by default (best quality)
+    speaker_id = SPEAKER_MAP[language][0]
+    payload = {
+        'text': text,
+        'language': lang_code,
+        'speaker_id': speaker_id
+    }
+    
+    logger.debug("TTS request - language: %s, speaker: %s", lang_code, speaker_id)
+    
+    return _call_gnlp('tts', payload, timeout=30, headers={'Cache-Control': 'no-cache'}, stream=stream)
+
+
+def _audio_from_response(response):
+    """Audio bytes from a 200 TTS response (raw audio, base64 JSON or an audio URL), or None"""
+    if _is_audio_response(response) or len(response.content) > 1000:
+        return response.content
+    
+    try:
+        audio, audio_url = _parse_tts_json(response.content)
+    except ValueError:
+        return None
+    if audio:
+        return audio
+    if audio_url:
+        audio_response = _get_audio_url(audio_url)
+        if audio_response.status_code == 200:
+            return audio_response.content
+    return None
+
+
+def _synthesize(text, language, cache_key):
+    """Synthesize text with the default speaker and return the audio bytes, or None"""
+    response = _request_tts(text, language, cache_key)
+    if response.status_code != 200:
+        logger.warning("TTS synthesis failed for %r (%s): status %s", text, language, response.status_code)
+        return None
+    return _audio_from_response(response)
+
+
+def _warm_tts_cache():
+    """Populate the TTS cache with the phrases listed in tts_warmup.json"""
+    try:
+        with open(TTS_WARMUP_FILE, 'rb') as f:
+            phrases = orjson.loads(f.read())
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load TTS warmup list: %s", e)
+        return
+    
+    warmed = 0
+    for entry in phrases:
+        text, language = entry['text'], entry['language']
+        if language not in SPEAKER_MAP:
+            continue
+        cache_key = _tts_cache_key(language, SPEAKER_MAP[language][0], text)
+        if _cache_get(_tts_cache, cache_key) is not None:
+            continue
+        try:
+            audio = _synthesize(text, language, cache_key)
+        except (GhanaNLPError, requests.exceptions.RequestException) as e:
+            logger.warning("TTS warmup stopped: %s", e)
+            break
+        if audio:
+            _cache_set(_tts_cache, cache_key, audio, TTS_WARMUP_CACHE_TTL)
+            warmed += 1
+    
+    logger.info("TTS warmup cached %d phrases", warmed)
+
+
+def _tts_audio_response(audio, language, speaker_id, text, as_base64):
+    """Return synthesized audio as raw bytes, or base64 JSON for older clients"""
+    if as_base64:
+        # pybase64 is SIMD-accelerated, and ASCII decoding skips UTF-8 validation
+        return _json_response({
+            'success': True,
+            'audio_data': pybase64.b64encode(audio).decode('ascii'),
+            'audio_format': 'audio/wav',
+            'language': language,
+            'speaker_id': speaker_id,
+            'text': text
+        })
+    return Response(audio, mimetype='audio/wav', headers={'X-Speaker-Id': speaker_id})
+
+
+def _stream_tts_audio(upstream, cache_key, speaker_id):
+    """Relay an upstream audio response chunk by chunk, caching it once complete"""
+    def generate():
+        chunks = []
+        try:
+            for chunk in upstream.iter_content(chunk_size=TTS_CHUNK_SIZE):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            upstream.close()
+        if chunks:
+            _cache_set(_tts_cache, cache_key, b''.join(chunks), TTS_CACHE_TTL)
+    
+    return Response(generate(), mimetype='audio/wav', headers={'X-Speaker-Id': speaker_id})
 
 @app.route('/api/text-to-speech', methods=['POST'])
 def text_to_speech():
     """
     Convert text to speech using GhanaNLP TTS API
-    Returns audio data as base64 for direct playback in browser
+    Returns the audio as audio/wav for direct playback in browser, or as
+    base64 inside JSON when the request sets 'format': 'base64'
     Supported: Twi (6 speakers), Ewe (2 speakers), Kikuyu (2 speakers)
     """
+    # Read outside the try so an oversized body reaches the 413 handler
+    raw = request.get_data(cache=False)
     try:
-        data = request.json
-        text = data.get('text', '')
-        language = data.get('language', 'tw')
+        req = msgspec.json.decode(raw, type=TTSRequest)
+        text = req.text
+        language = req.language
+        as_base64 = req.format == 'base64'
         
         if not text:
-            return jsonify({'error': 'Missing text'}), 400
+            return _json_response({'error': 'Missing text'}, 400)
         
         # Check if API key is configured
         if not GHANANLP_API_KEY:
-            return jsonify({
+            return _json_response({
                 'error': 'API key not configured',
                 'details': 'Please add your GhanaNLP API key to .env file'
-            }), 401
-        
-        # TTS API endpoint
-        TTS_API_URL = "https://translation-api.ghananlp.org/tts/v1/synthesize"
-        
-        # Speaker mapping based on GhanaNLP API response
-        speaker_map = {
-            'tw': ['twi_speaker_4', 'twi_speaker_5', 'twi_speaker_6', 'twi_speaker_7', 'twi_speaker_8', 'twi_speaker_9'],
-            'ewe': ['ewe_speaker_3', 'ewe_speaker_4'],
-            'kikuyu': ['kikuyu_speaker_1', 'kikuyu_speaker_5']
-        }
-        
-        # Language codes for TTS
-        tts_lang_map = {
-            'tw': 'tw',
-            'ewe': 'ee',
-            'kikuyu': 'ki'
-        }
+            }, 401)
         
         # Check if language has TTS support
-        if language not in speaker_map:
-            return jsonify({
+        if language not in SPEAKER_MAP:
+            return _json_response({
                 'error': 'TTS not available',
                 'details': f'Text-to-speech is not available for {language}. Supported languages: Twi, Ewe, Kikuyu.',
                 'use_browser_tts': language == 'en'
-            }), 400
+            }, 400)
         
-        lang_code = tts_lang_map.get(language, language)
         # Use the first speaker by default (best quality)
-        speaker_id = speaker_map[language][0]
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Cache-Control': 'no-cache',
-            'Ocp-Apim-Subscription-Key': GHANANLP_API_KEY
-        }
-        
-        payload = {
-            'text': text,
-            'language': lang_code,
-            'speaker_id': speaker_id
-        }
-        
-        print(f"TTS Request - Language: {lang_code}, Speaker: {speaker_id}")
+        speaker_id = SPEAKER_MAP[language][0]
         
-        response = requests.post(TTS_API_URL, json=payload, headers=headers, timeout=30)
+        cache_key = _tts_cache_key(language, speaker_id, text)
+        cached = _cache_get(_tts_cache, cache_key)
+        if cached is not None:
+            return _tts_audio_response(cached, language, speaker_id, text, as_base64)
         
-        print(f"TTS Response status: {response.status_code}")
+        response = _request_tts(text, language, cache_key, stream=True)
         
         if response.status_code == 200:
-            content_type = response.headers.get('Content-Type', '').lower()
+            # Audio bytes: pass them straight through to the client
+            if _is_audio_response(response) and not as_base64:
+                return _stream_tts_audio(response, cache_key, speaker_id)
             
-            # Check if response is audio data
-            if 'audio' in content_type or 'octet-stream' in content_type or len(response.content) > 1000:
-                import base64
-                audio_base64 = base64.b64encode(response.content).decode('utf-8')
-                
-                print(f"✅ Audio data successfully encoded: {len(audio_base64)} chars")
-                
-                return jsonify({
-                    'success': True,
-                    'audio_data': audio_base64,
-                    'audio_format': 'audio/wav',
-                    'language': language,
-                    'speaker_id': speaker_id,
-                    'text': text
-                })
-            else:
-                # Try parsing as JSON
-                try:
-                    result = response.json()
-                    audio_data = result.get('audio', result.get('audio_content', result.get('audio_base64', '')))
-                    audio_url = result.get('audio_url', result.get('url', ''))
-                    
-                    if audio_data:
-                        return jsonify({
-                            'success': True,
-                            'audio_data': audio_data,
-                            'audio_format': 'audio/wav',
-                            'language': language,
-                            'speaker_id': speaker_id,
-                            'text': text
-                        })
-                    elif audio_url:
-                        # Fetch audio from URL
-                        audio_response = requests.get(audio_url, timeout=30)
-                        if audio_response.status_code == 200:
-                            import base64
-                            audio_base64 = base64.b64encode(audio_response.content).decode('utf-8')
-                            return jsonify({
-                                'success': True,
-                                'audio_data': audio_base64,
-                                'audio_format': 'audio/wav',
-                                'language': language,
-                                'speaker_id': speaker_id,
-                                'text': text
-                            })
-                except ValueError:
-                    pass
-                
-                return jsonify({
-                    'error': 'No audio data in response',
-                    'details': 'The TTS API did not return audio data.'
-                }), 500
+            audio = _audio_from_response(response)
+            if audio:
+                _cache_set(_tts_cache, cache_key, audio, TTS_CACHE_TTL)
+                return _tts_audio_response(audio, language, speaker_id, text, as_base64)
+            
+            return _json_response({
+                'error': 'No audio data in response',
+                'details': 'The TTS API did not return audio data.'
+            }, 500)
         
         elif response.status_code == 401:
-            return jsonify({
+            # Streamed responses must be closed to hand the connection back to the pool
+            response.close()
+            return _json_response({
                 'error': 'Authentication failed',
                 'details': 'Your GhanaNLP API key is invalid or expired.'
-            }), 401
+            }, 401)
         
         elif response.status_code == 403:
-            return jsonify({
+            response.close()
+            return _json_response({
                 'error': 'Access forbidden',
                 'details': 'TTS access is not enabled for your API key.'
-            }), 403
+            }, 403)
         
         else:
-            error_msg = f"TTS API returned status {response.status_code}"
-            try:
-                error_data = response.json()
-                error_msg = error_data.get('error', error_data.get('message', error_msg))
-            except:
-                error_msg = response.text[:200] if response.text else error_msg
+            error_msg = _upstream_error_message(response, f"TTS API returned status {response.status_code}")
             
-            return jsonify({
+            details = f'Status code: {response.status_code}'
+            if response.status_code >= 500:
+                _remember_error(cache_key, error_msg, details, response.status_code)
+            
+            return _json_response({
                 'error': error_msg,
-                'details': f'Status code: {response.status_code}'
-            }), response.status_code
+                'details': details
+            }, response.status_code)
             
+    except msgspec.DecodeError as e:
+        return _json_response({'error': 'Invalid request body', 'details': str(e)}, 400)
+    except GhanaNLPError as e:
+        return _json_response({'error': e.error, 'details': e.details}, e.status_code)
     except requests.exceptions.Timeout:
-        return jsonify({
+        return _json_response({
             'error': 'TTS request timed out',
             'details': 'The speech generation took too long. Try with shorter text.'
-        }), 504
+        }, 504)
     except requests.exceptions.ConnectionError:
-        return jsonify({
+        return _json_response({
             'error': 'Connection error',
             'details': 'Unable to connect to GhanaNLP TTS API.'
-        }), 503
+        }, 503)
     except Exception as e:
-        print(f"TTS Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
+        logger.exception("TTS error: %s", e)
+        return _json_response({
             'error': str(e),
             'details': 'An unexpected error occurred during speech generation'
-        }), 500
+        }, 500)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Check if API key is configured"""
     is_configured = bool(GHANANLP_API_KEY)
-    return jsonify({
+    return _json_response({
         'status': 'configured' if is_configured else 'needs_setup',
         'message': 'Ready to translate!' if is_configured else 'Please configure your GhanaNLP API key in .env file'
     })
 
+if TTS_WARMUP and GHANANLP_API_KEY:
+    # Runs as a greenlet under gevent, so it doesn't hold up startup
+    threading.Thread(target=_warm_tts_cache, daemon=True).start()
+
 if __name__ == '__main__':
     app.run(debug=False)
\ No newline at end of file
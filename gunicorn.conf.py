@@ -0,0 +1,13 @@
+# Gunicorn configuration
+# Run with: gunicorn -c gunicorn.conf.py app:application
+#
+# Translation and TTS handlers spend nearly all their time waiting on the
+# GhanaNLP API, so gevent workers let each process serve many in-flight
+# requests instead of one per worker.
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = 'gevent'
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '500'))
+timeout = 60